@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import tempfile
+import asyncio
+import functools
+from collections import defaultdict
+import aiohttp
+import lxml.etree
+
+BASE_URL = "https://www.horoskopy.cz"
+
+HTTP_HEADERS = {"User-Agent": "HoroskopySlackScraper/1.0"}
+HTTP_TIMEOUT = aiohttp.ClientTimeout(total=5)
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.3
+HTTP_RETRY_STATUSES = {429, 502, 503, 504}
+
+HTTP_CHUNK_SIZE = 8192
+
+TEPLOMER_ATTRS = {'id': 'teplomer', 'data-dot': 'd_vztah_k_ostatnim'}
+
+CACHE_PATH_TEMPLATE = '/tmp/horoscope_{date}.json'
+VALIDATORS_PATH = '/tmp/horoscope_validators.json'
+
+_DIACRITICS = "áčďéěíňóřšťúůýž"
+_DIACRITICS_MAP = str.maketrans(
+    _DIACRITICS + _DIACRITICS.upper(),
+    "acdeeinorstuuyz" + "acdeeinorstuuyz".upper(),
+)
+
+ZODIACS = [
+    "beran", "lev", "strelec", "byk", "panna", "kozoroh",
+    "blizenci", "vahy", "vodnar", "rak", "stir", "ryby"
+]
+
+PERCENTAGES = ["100%", "80%", "60%", "40%", "20%", "0%", "-20%", "-40%", "-60%", "-80%", "-100%"]
+
+
+def load_names_zodiacs(filename):
+    """
+    Load zodiac names from a JSON file.
+    """
+    with open(filename, 'r', encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _read_json_cache(path):
+    """
+    Load a JSON cache file, or return None if it is missing or unreadable.
+    """
+    try:
+        with open(path, 'r', encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json_cache(path, data):
+    """
+    Atomically write data to a JSON cache file.
+
+    The data is written to a temporary file next to the target first, so a
+    crash mid-write never leaves a truncated cache behind.
+    """
+    file = tempfile.NamedTemporaryFile('w', encoding="utf-8", dir=os.path.dirname(path),
+                                       suffix='.tmp', delete=False)
+    try:
+        with file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(file.name, path)
+    except BaseException:
+        os.unlink(file.name)
+        raise
+
+
+async def _get_with_retry(session, url, read, headers=None):
+    """
+    GET the given URL and return the result of awaiting read(response).
+
+    Transient errors are retried with exponential backoff and raised once
+    the retries run out. Any other status is passed to read as is.
+    """
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        last_attempt = attempt == HTTP_MAX_RETRIES
+        try:
+            async with session.get(url, headers=headers) as response:
+                if response.status not in HTTP_RETRY_STATUSES:
+                    return await read(response)
+                if last_attempt:
+                    response.raise_for_status()
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if last_attempt:
+                raise
+        await asyncio.sleep(HTTP_BACKOFF_FACTOR * (2 ** attempt))
+
+
+async def _read_teplomer(response):
+    """
+    Stream a zodiac sign page and parse its compatibility values.
+
+    Reading stops as soon as the teplomer div has been closed.
+    """
+    parser = lxml.etree.HTMLPullParser(events=("end",), tag="div", encoding=response.charset or "utf-8")
+    async for chunk in response.content.iter_chunked(HTTP_CHUNK_SIZE):
+        parser.feed(chunk)
+        for _, element in parser.read_events():
+            if all(element.get(key) == value for key, value in TEPLOMER_ATTRS.items()):
+                values = []
+                for li in element.iter('li'):
+                    text = ''.join(part.strip() for part in li.itertext())
+                    values.append(text if text else " ")
+                return values
+
+    return None
+
+
+async def _fetch_zodiac_page(session, base_url, sign, cached=None):
+    """
+    Fetch and parse the compatibility values of a single zodiac sign.
+
+    Returns a dict with the parsed values and the response's ETag and
+    Last-Modified validators. When a cached entry is given the page is
+    requested conditionally and the cached entry is reused on 304.
+    """
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    async def read(response):
+        if response.status == 304:
+            return cached
+        return {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "values": await _read_teplomer(response),
+        }
+
+    return await _get_with_retry(session, f"{base_url}/{sign}", read, headers=headers)
+
+
+async def fetch_zodiac_data(base_url, zodiac_signs):
+    """
+    Fetch zodiac compatibility data from the given URL.
+
+    All signs are requested concurrently over a single keep-alive session.
+    A complete result is cached on disk for the rest of the day, and pages
+    that were fetched before are revalidated with a conditional GET.
+    """
+    cache_path = CACHE_PATH_TEMPLATE.format(date=time.strftime('%Y-%m-%d'))
+    horoscope_data = _read_json_cache(cache_path)
+    if horoscope_data is not None:
+        return horoscope_data
+
+    validators = _read_json_cache(VALIDATORS_PATH) or {}
+
+    connector = aiohttp.TCPConnector(limit=len(zodiac_signs), ttl_dns_cache=300)
+    async with aiohttp.ClientSession(connector=connector, headers=HTTP_HEADERS, timeout=HTTP_TIMEOUT) as session:
+        results = await asyncio.gather(
+            *(_fetch_zodiac_page(session, base_url, sign, validators.get(sign)) for sign in zodiac_signs)
+        )
+
+    pages = {sign: page for sign, page in zip(zodiac_signs, results) if page["values"] is not None}
+    horoscope_data = {sign: page["values"] for sign, page in pages.items()}
+
+    _write_json_cache(VALIDATORS_PATH, pages)
+
+    # Don't freeze a partial table for the whole day
+    if len(horoscope_data) == len(zodiac_signs):
+        _write_json_cache(cache_path, horoscope_data)
+
+    return horoscope_data
+
+
+def format_compatibility_data(horoscope_data, percentages, names_zodiacs):
+    """
+    Format zodiac compatibility data into a table of columns keyed by header.
+
+    The first column, "Percent", holds the row labels.
+    """
+    table = {"Percent": percentages}
+    joined_names = {zodiac: ", ".join(names) for zodiac, names in names_zodiacs.items() if names}
+    formatted_cache = {}
+
+    def format_value(value):
+        formatted = formatted_cache.get(value)
+        if formatted is None:
+            parts = (part.strip().lower() for part in value.split(','))
+            formatted = ", ".join(joined_names[part] for part in parts if part in joined_names)
+            formatted_cache[value] = formatted
+        return formatted
+
+    for sign, values in horoscope_data.items():
+        table[sign.capitalize()] = [format_value(value) for value in values]
+
+    return table
+
+
+@functools.lru_cache(maxsize=64)
+def _remove_diacritics(text):
+    """
+    Remove Czech diacritics from a given text.
+    """
+    return text.translate(_DIACRITICS_MAP)
+
+
+def generate_relationship_summary(table, names_zodiacs, percentage, relationship_type):
+    """
+    Generate a summary of relationships based on compatibility percentage.
+    """
+    aggregated_relationships = defaultdict(set)
+    target_row = table["Percent"].index(f"{percentage}%")
+    zodiac_columns = {zodiac: _remove_diacritics(zodiac).capitalize() for zodiac in names_zodiacs}
+
+    for zodiac, names in names_zodiacs.items():
+        column = zodiac_columns[zodiac]
+        if column not in table:
+            continue
+
+        related_names = {n.strip() for n in table[column][target_row].split(',') if n.strip()}
+        for name in names:
+            for person in related_names - {name}:
+                # Store each pair once, keyed by the alphabetically first name
+                first, second = sorted((name, person))
+                aggregated_relationships[first].add(second)
+
+    summary_lines = []
+    for name, related in sorted(aggregated_relationships.items()):
+        related_string = ', '.join(sorted(related))
+        if relationship_type == "nepřítel":
+            summary_lines.append(f"- {name} je s {related_string} dnes {relationship_type}!")
+        else:
+            summary_lines.append(f"+ {name} je s {related_string} dnes {relationship_type}!")
+
+    return "\n".join(summary_lines)
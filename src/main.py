@@ -1,296 +1,230 @@
+import io
 import os
-import json
 import time
-import unicodedata
-import requests
-from bs4 import BeautifulSoup
+import asyncio
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 from slack_sdk.errors import SlackApiError
-from slack_sdk import WebClient
+from slack_sdk.web.async_client import AsyncWebClient
 from dotenv import load_dotenv
-import pandas as pd
-import imgkit
+from PIL import Image, ImageDraw, ImageFont
+from core import (
+    BASE_URL, ZODIACS, PERCENTAGES,
+    load_names_zodiacs, fetch_zodiac_data, format_compatibility_data, generate_relationship_summary,
+)
 
 load_dotenv()
 
-BASE_URL = "https://www.horoskopy.cz"
-
-IMG_PATH = '/tmp/horoscope_table.png'
-
-ZODIACS = [
-    "beran", "lev", "strelec", "byk", "panna", "kozoroh",
-    "blizenci", "vahy", "vodnar", "rak", "stir", "ryby"
-]
-
-PERCENTAGES = ["100%", "80%", "60%", "40%", "20%", "0%", "-20%", "-40%", "-60%", "-80%", "-100%"]
-
 SLACK_BOT_TOKEN = os.getenv('SLACK_BOT_TOKEN')
 SLACK_APP_TOKEN = os.getenv('SLACK_APP_TOKEN')
 SLACK_CHANNEL_ID = os.getenv('SLACK_CHANNEL_ID')
 
 app = App(token=SLACK_BOT_TOKEN)
-client = WebClient(token=SLACK_BOT_TOKEN)
-
+client = AsyncWebClient(token=SLACK_BOT_TOKEN)
 
-def load_names_zodiacs(filename):
-    """
-    Load zodiac names from a JSON file.
-    """
-    with open(filename, 'r', encoding="utf-8") as file:
-        return json.load(file)
+SLACK_MIN_INTERVAL = 1.0
+SLACK_MAX_RETRIES = 3
 
+FONT_DIR = os.path.join(os.path.dirname(__file__), 'fonts')
+CELL_FONT_PATH = os.path.join(FONT_DIR, 'SourceSansPro-Semibold.ttf')
+HEADER_FONT_PATH = os.path.join(FONT_DIR, 'SourceSansPro-Bold.ttf')
 
-NAMES_ZODIACS = load_names_zodiacs('../names_zodiacs.json')
+TABLE_BACKGROUND = (44, 42, 99)
+TABLE_HEADER_BACKGROUND = (24, 26, 27)
+TABLE_BORDER = (221, 221, 221)
+TABLE_TEXT = (255, 255, 255)
+TABLE_HEADER_FONT_SIZE = 16
+TABLE_CELL_FONT_SIZE = 14
+TABLE_PADDING = 8
+TABLE_WIDTH = 1400
+TABLE_RADIUS = 20
 
 
-def fetch_zodiac_data(base_url, zodiac_signs):
+class SlackSender:
     """
-    Fetch zodiac compatibility data from the given URL.
-    """
-    horoscope_data = {}
-    for sign in zodiac_signs:
-        url = f"{base_url}/{sign}"
-        response = requests.get(url, timeout=5)
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        teplomer_div = soup.find('div', id='teplomer', attrs={'data-dot': 'd_vztah_k_ostatnim'})
-        if teplomer_div:
-            values = []
-            for li in teplomer_div.find_all('li'):
-                text = li.get_text(strip=True)
-                values.append(text if text else " ")
-            horoscope_data[sign] = values
+    Pace Slack API calls to one per second and retry rate-limited ones
+    up to SLACK_MAX_RETRIES times.
 
-    return horoscope_data
-
-
-def format_compatibility_data(horoscope_data, percentages, names_zodiacs):
-    """
-    Format zodiac compatibility data into a DataFrame.
+    Calls are serialized through a lock, so concurrent senders share the pacing.
     """
-    df_data = {"Percent": percentages}
 
-    for sign, values in horoscope_data.items():
-        formatted_values = []
-        for value in values:
-            parts = value.split(',')
-            names = []
-            for part in parts:
-                part = part.strip().lower()
-                if part in names_zodiacs and names_zodiacs[part]:
-                    names.append(", ".join(names_zodiacs[part]))
-            formatted_values.append(", ".join(names))
-        df_data[sign.capitalize()] = formatted_values
+    def __init__(self, web_client, min_interval=SLACK_MIN_INTERVAL):
+        self.client = web_client
+        self.min_interval = min_interval
+        self.last_sent = 0.0
+        self._ratelimit_lock = asyncio.Lock()
 
-    df = pd.DataFrame(df_data)
-    df.set_index("Percent", inplace=True)
+    async def _call(self, method, **kwargs):
+        async with self._ratelimit_lock:
+            for attempt in range(SLACK_MAX_RETRIES + 1):
+                await asyncio.sleep(max(0.0, self.min_interval - (time.monotonic() - self.last_sent)))
+                try:
+                    return await method(**kwargs)
+                except SlackApiError as e:
+                    if e.response.status_code != 429 or attempt == SLACK_MAX_RETRIES:
+                        raise
+                    await asyncio.sleep(int(e.response.headers.get('Retry-After', '1')))
+                finally:
+                    self.last_sent = time.monotonic()
 
-    return df
+    async def post(self, **kwargs):
+        """
+        Send a message via chat.postMessage.
+        """
+        return await self._call(self.client.chat_postMessage, **kwargs)
 
+    async def upload(self, **kwargs):
+        """
+        Upload a file via files_upload_v2.
+        """
+        return await self._call(self.client.files_upload_v2, **kwargs)
 
-def dataframe_to_html(df):
-    """
-    Converts a DataFrame to an HTML table using custom HTML and CSS styling.
-    """
-    # Create the HTML table structure manually
-    html = '<table class="dataframe">'
-
-    # Header row
-    html += '<tr>'
-    html += '<th class="percent-header"></th>'  # Add Percent to the first row with special class
-    for column in df.columns:
-        html += f'<th>{column}</th>'
-    html += '</tr>'
-
-    # Data rows
-    for index, row in df.iterrows():
-        html += '<tr>'
-        html += f'<td class="percent-cell">{index}</td>'  # Percent column with special class
-        for value in row:
-            html += f'<td>{value}</td>'
-        html += '</tr>'
-
-    html += '</table>'
-
-    # Define CSS for table styling
-    css = """
-    <style>
-        @import url('https://fonts.googleapis.com/css2?family=Comfortaa:wght@400;700&display=swap');
-
-        body {
-            margin: 0;
-            padding: 0;
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            min-height: 100vh;
-            background-color: #2C2A63;
-        }
-        .dataframe {
-            border-collapse: separate;
-            border-spacing: 0;
-            font-family: 'Comfortaa', sans-serif;
-            background-color: #2C2A63;
-            color: white;
-            border-radius: 20px;
-            overflow: hidden;
-            max-width: 100%;
-            margin: auto;
-        }
-        .dataframe th, .dataframe td {
-            border: 1px solid #ddd;
-            padding: 8px;
-            text-align: left;
-            font-size: 14px;
-            font-weight: 600;
-            max-width: 150px;
-            overflow: hidden;
-            text-overflow: ellipsis;
-        }
-        .dataframe th {
-            background-color: #181A1B;
-            color: white;
-            font-weight: bold;
-            font-size: 16px;
-        }
-        .dataframe .percent-header, .dataframe .percent-cell {
-            background-color: #181A1B;
-            color: white;
-            font-weight: bold;
-            font-size: 16px;
-        }
-        .dataframe tr:first-child th:first-child {
-            border-top-left-radius: 20px;
-        }
-        .dataframe tr:first-child th:last-child {
-            border-top-right-radius: 20px;
-        }
-        .dataframe tr:last-child td:first-child {
-            border-bottom-left-radius: 20px;
-        }
-        .dataframe tr:last-child td:last-child {
-            border-bottom-right-radius: 20px;
-        }
-    </style>
-    """
-
-    full_html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        {css}
-    </head>
-    <body>
-        {html}
-    </body>
-    </html>
-    """
 
-    return full_html
+sender = SlackSender(client)
 
 
-def html_to_image(html_content, output_path):
-    """
-    Convert HTML content to an image file.
-    """
-    options = {
-        "transparent": "",
-        'format': 'png',
-        'encoding': "UTF-8",
-        'width': 1400,
-        'quality': 100,
-    }
-    imgkit.from_string(html_content, output_path, options=options)
+NAMES_ZODIACS = load_names_zodiacs('../names_zodiacs.json')
 
 
-def send_message_and_table(channel_id, summary, image_path):
-    """
-    Send a message and an image file to Slack.
-    """
+def _wrap_text(text, font, max_width):
+    """
+    Break text into lines that fit into max_width pixels.
+
+    Lines are broken after the commas between names, and a name that is
+    too long on its own is broken between its words. A single word wider
+    than max_width is split across lines rather than clipped.
+    """
+    parts = text.split(", ")
+    lines = []
+    line = ""
+    for i, part in enumerate(parts):
+        piece = part + ("," if i < len(parts) - 1 else "")
+        words = piece.split(" ") if font.getlength(piece) > max_width else [piece]
+        for word in words:
+            candidate = f"{line} {word}" if line else word
+            if line and font.getlength(candidate) > max_width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+            while font.getlength(line) > max_width and len(line) > 1:
+                cut = len(line) - 1
+                while cut > 1 and font.getlength(line[:cut]) > max_width:
+                    cut -= 1
+                lines.append(line[:cut])
+                line = line[cut:]
+    lines.append(line)
+    return lines
+
+
+def render_table_png(table):
+    """
+    Render a compatibility table into PNG image bytes.
+
+    The Percent column is as wide as its labels, the zodiac columns share the
+    rest of TABLE_WIDTH, and cell text wraps onto as many lines as it needs.
+    """
+    header_font = ImageFont.truetype(HEADER_FONT_PATH, TABLE_HEADER_FONT_SIZE)
+    cell_font = ImageFont.truetype(CELL_FONT_PATH, TABLE_CELL_FONT_SIZE)
+
+    percentages = table["Percent"]
+    columns = [column for column in table if column != "Percent"]
+
+    # Grid of (text, font, is_header) with the header row and Percent column first
+    grid = [[("", header_font, True)] + [(column, header_font, True) for column in columns]]
+    for index, *row in zip(percentages, *(table[column] for column in columns)):
+        grid.append([(index, header_font, True)] + [(value, cell_font, False) for value in row])
+
+    # The border of the last column takes the final pixel
+    percent_width = max(int(header_font.getlength(index)) for index in percentages) + 2 * TABLE_PADDING
+    column_width, remainder = divmod(TABLE_WIDTH - 1 - percent_width, len(columns))
+    column_widths = [percent_width] + [column_width] * len(columns)
+    column_widths[-1] += remainder
+
+    grid = [
+        [(_wrap_text(text, font, width - 2 * TABLE_PADDING), font, is_header)
+         for (text, font, is_header), width in zip(row, column_widths)]
+        for row in grid
+    ]
+    row_heights = [
+        max(len(lines) * sum(font.getmetrics()) for lines, font, _ in row) + 2 * TABLE_PADDING
+        for row in grid
+    ]
+
+    width = TABLE_WIDTH
+    height = sum(row_heights) + 1
+    image = Image.new("RGB", (width, height), TABLE_BACKGROUND)
+    draw = ImageDraw.Draw(image)
+
+    y = 0
+    for row, row_height in zip(grid, row_heights):
+        x = 0
+        for (lines, font, is_header), column_width in zip(row, column_widths):
+            fill = TABLE_HEADER_BACKGROUND if is_header else TABLE_BACKGROUND
+            draw.rectangle((x, y, x + column_width, y + row_height), fill=fill, outline=TABLE_BORDER)
+
+            # Center the lines vertically, like the old table cells
+            line_height = sum(font.getmetrics())
+            line_y = y + (row_height - len(lines) * line_height) / 2
+            for line in lines:
+                draw.text((x + TABLE_PADDING, line_y), line, font=font, fill=TABLE_TEXT)
+                line_y += line_height
+            x += column_width
+        y += row_height
+
+    # Round the outer corners of the table
+    mask = Image.new("L", image.size, 0)
+    ImageDraw.Draw(mask).rounded_rectangle((0, 0, width - 1, height - 1), TABLE_RADIUS, fill=255)
+    rounded = Image.new("RGB", image.size, TABLE_BACKGROUND)
+    rounded.paste(image, mask=mask)
+    ImageDraw.Draw(rounded).rounded_rectangle((0, 0, width - 1, height - 1), TABLE_RADIUS, outline=TABLE_BORDER)
+
+    output = io.BytesIO()
+    rounded.save(output, format="PNG")
+    return output.getvalue()
+
+
+async def send_intro_message(channel_id, summary):
+    """
+    Send the daily intro message with the relationship summary to Slack.
+    """
+    intro_message = (
+        f">*Vztah znamení k ostatním znamení ke dni: _{time.strftime('%d.%m.%Y')}_*\n"
+        f"{summary}\n"
+    )
     try:
-        # Intro message
-        intro_message = (
-            f">*Vztah znamení k ostatním znamení ke dni: _{time.strftime('%d.%m.%Y')}_*\n"
-            f"{summary}\n"
-        )
-        response_message = client.chat_postMessage(
+        response_message = await sender.post(
             channel=channel_id,
             text=intro_message
         )
         print(f"Message sent to {channel_id}: {response_message['ts']}")
+    except SlackApiError as e:
+        print(f"Error sending message to Slack: {e.response['error']}")
+
 
-        # Image upload
-        response_file = client.files_upload_v2(
+async def send_table_image(channel_id, image):
+    """
+    Upload the PNG table image to Slack.
+    """
+    try:
+        response_file = await sender.upload(
             channels=channel_id,
-            file=image_path,
+            content=image,
+            filename="horoscope.png",
             title="Horoskopy",
         )
         print(f"Image sent to {channel_id}: {response_file['file']['id']}")
-
     except SlackApiError as e:
-        print(f"Error sending message or image to Slack: {e.response['error']}")
+        print(f"Error sending image to Slack: {e.response['error']}")
 
 
-def _remove_diacritics(text):
-    """
-    Remove diacritics from a given text.
-    """
-    return ''.join(c for c in unicodedata.normalize('NFD', text)
-                   if unicodedata.category(c) != 'Mn')
-
-
-def generate_relationship_summary(df, names_zodiacs, percentage, relationship_type):
-    """
-    Generate a summary of relationships based on compatibility percentage.
-    """
-    relationships_dict = {}
-
-    for zodiac, names in names_zodiacs.items():
-        zodiac_no_diacritics = _remove_diacritics(zodiac).capitalize()
-        if zodiac_no_diacritics in df.columns:
-            column_data = df[zodiac_no_diacritics]
-            for name in names:
-                for percent, related_names in column_data.items():
-                    if int(percent[:-1]) == percentage:
-                        related_names_list = [n.strip() for n in related_names.split(',') if n]
-                        if name in related_names_list:
-                            related_names_list.remove(name)
-                        if related_names_list:
-                            if name not in relationships_dict:
-                                relationships_dict[name] = set()
-                            relationships_dict[name].update(related_names_list)
-
-    unique_relationships = set()
-    for name, related in relationships_dict.items():
-        for person in related:
-            relationship = tuple(sorted([name, person]))
-            unique_relationships.add(relationship)
-
-    aggregated_relationships = {}
-    for relationship in unique_relationships:
-        key = relationship[0]
-        if key not in aggregated_relationships:
-            aggregated_relationships[key] = set()
-        aggregated_relationships[key].update(relationship[1:])
-
-    summary_lines = []
-    for name, related in aggregated_relationships.items():
-        related_string = ', '.join(sorted(related))
-        if relationship_type == "nepřítel":
-            summary_lines.append(f"- {name} je s {related_string} dnes {relationship_type}!")
-        else:
-            summary_lines.append(f"+ {name} je s {related_string} dnes {relationship_type}!")
-
-    return "\n".join(summary_lines)
-
-
-def send_daily_horoscope():
+async def send_daily_horoscope():
     """
     Fetch, format, and send daily horoscope data.
+
+    The intro message is posted while the table image is being rendered.
     """
-    raw_compatibility_data = fetch_zodiac_data(BASE_URL, ZODIACS)
+    raw_compatibility_data = await fetch_zodiac_data(BASE_URL, ZODIACS)
     formatted_compatibility_data = format_compatibility_data(raw_compatibility_data, PERCENTAGES, NAMES_ZODIACS)
 
     friends_summary = generate_relationship_summary(formatted_compatibility_data, NAMES_ZODIACS, 100, "kamarád")
@@ -298,13 +232,15 @@ def send_daily_horoscope():
 
     combined_summary = f"Kamarádi:\n{friends_summary}\n\nNepřátelé:\n{enemies_summary}"
 
-    html_content = dataframe_to_html(formatted_compatibility_data)
-    html_to_image(html_content, IMG_PATH)
+    _, image = await asyncio.gather(
+        send_intro_message(SLACK_CHANNEL_ID, combined_summary),
+        asyncio.to_thread(render_table_png, formatted_compatibility_data),
+    )
 
-    send_message_and_table(SLACK_CHANNEL_ID, combined_summary, IMG_PATH)
+    await send_table_image(SLACK_CHANNEL_ID, image)
 
 
 if __name__ == "__main__":
-    send_daily_horoscope()
+    asyncio.run(send_daily_horoscope())
     handler = SocketModeHandler(app, SLACK_APP_TOKEN)
     handler.connect()